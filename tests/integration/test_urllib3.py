@@ -2,6 +2,8 @@
 
 # coding=utf-8
 
+import queue
+
 import pytest
 import pytest_httpbin
 from assertions import assert_cassette_empty, assert_is_json
@@ -163,3 +165,24 @@ def test_urllib3_force_reset():
         assert conn.HTTPConnection is first_cassette_HTTPConnection
         assert conn.HTTPSConnection is first_cassette_HTTPSConnection
         assert conn.VerifiedHTTPSConnection is first_cassette_VerifiedHTTPSConnection
+
+
+def test_connections_pooled_before_cassette_are_skipped(tmpdir):
+    pool = urllib3.HTTPConnectionPool("localhost", maxsize=2)
+    real_connection = pool._get_conn()
+    pool._put_conn(real_connection)
+    with vcr.use_cassette(str(tmpdir.join("pooled.yaml"))) as cass:
+        connection = pool._get_conn()
+        assert connection.cassette is cass
+        assert real_connection in pool.pool.queue
+        pool._put_conn(connection)
+    assert pool._get_conn() is real_connection
+
+
+def test_pool_with_non_lifo_queue(tmpdir):
+    class FifoPool(urllib3.HTTPConnectionPool):
+        QueueCls = queue.Queue
+
+    pool = FifoPool("localhost", maxsize=2)
+    with vcr.use_cassette(str(tmpdir.join("fifo.yaml"))) as cass:
+        assert pool._get_conn().cassette is cass
@@ -0,0 +1,78 @@
+from vcr.cassette import Cassette
+from vcr.patch import CassettePatcherBuilder, ConnectionRemover, _AttrPatch
+from vcr.stubs import VCRHTTPConnection, VCRHTTPSConnection
+
+
+class Base:
+    attribute = "base"
+
+
+class Derived(Base):
+    pass
+
+
+def test_attr_patch_restores_local_attribute():
+    with _AttrPatch(Base, "attribute", "patched"):
+        assert Base.attribute == "patched"
+    assert Base.__dict__["attribute"] == "base"
+
+
+def test_attr_patch_removes_inherited_attribute():
+    with _AttrPatch(Derived, "attribute", "patched"):
+        assert Derived.attribute == "patched"
+        assert Base.attribute == "base"
+    assert "attribute" not in Derived.__dict__
+    assert Derived.attribute == "base"
+
+
+def test_attr_patch_nested_inherited_attributes():
+    with _AttrPatch(Base, "attribute", "outer"):
+        with _AttrPatch(Derived, "attribute", "inner"):
+            assert Derived.attribute == "inner"
+        assert Derived.attribute == "outer"
+    assert "attribute" not in Derived.__dict__
+    assert Base.attribute == "base"
+
+
+class Slotted:
+    __slots__ = ("attribute",)
+
+
+def test_attr_patch_restores_slot_attribute():
+    slotted = Slotted()
+    slotted.attribute = "original"
+    with _AttrPatch(slotted, "attribute", "patched"):
+        assert slotted.attribute == "patched"
+    assert slotted.attribute == "original"
+
+
+def test_replacement_dicts_are_not_modified():
+    replacement_dict = {"http": VCRHTTPConnection, "nested": {"https": VCRHTTPSConnection}}
+    cassette = Cassette("test")
+    builder = CassettePatcherBuilder(cassette)
+
+    applied = builder._recursively_apply_get_cassette_subclass(replacement_dict)
+
+    assert applied["http"].cassette is cassette
+    assert applied["nested"]["https"].cassette is cassette
+    assert replacement_dict == {"http": VCRHTTPConnection, "nested": {"https": VCRHTTPSConnection}}
+    assert builder._recursively_apply_get_cassette_subclass(replacement_dict) is applied
+
+
+class Pool:
+    pool = None
+
+
+def test_connection_remover_remove_connection_to_pool_entry():
+    remover = ConnectionRemover(VCRHTTPConnection)
+    pool = Pool()
+    connection = VCRHTTPConnection.__new__(VCRHTTPConnection)
+
+    remover.add_connection_to_pool_entry(pool, connection)
+    remover.add_connection_to_pool_entry(pool, object())
+    assert remover._connection_pool_to_connections[pool] == {connection}
+
+    remover.remove_connection_to_pool_entry(pool, connection)
+    remover.remove_connection_to_pool_entry(pool, connection)
+    remover.remove_connection_to_pool_entry(Pool(), connection)
+    assert remover._connection_pool_to_connections[pool] == set()
@@ -1,3 +1,4 @@
+import subprocess
 import sys
 
 
@@ -13,3 +14,8 @@ def test_vcr_import_deprecation(recwarn):
         assert issubclass(recwarn[0].category, DeprecationWarning)
     else:
         assert len(recwarn) == 0
+
+
+def test_vcr_import_does_not_import_mock():
+    code = "import sys, vcr; sys.exit('unittest.mock' in sys.modules)"
+    assert subprocess.call([sys.executable, "-c", code]) == 0
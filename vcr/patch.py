@@ -1,10 +1,11 @@
 """Utilities for patching in cassettes"""
+
+import collections
 import contextlib
 import functools
 import http.client as httplib
-import itertools
 import logging
-from unittest import mock
+import queue
 
 from .stubs import VCRHTTPConnection, VCRHTTPSConnection
 
@@ -13,9 +14,18 @@ log = logging.getLogger(__name__)
 _HTTPConnection = httplib.HTTPConnection
 _HTTPSConnection = httplib.HTTPSConnection
 
+_HAS_BOTOCORE = False
+_HAS_URLLIB3 = False
+_HAS_HTTPLIB2 = False
+_HAS_BOTO = False
+_HAS_TORNADO_SIMPLE = False
+_HAS_TORNADO_CURL = False
+_HAS_AIOHTTP = False
+_HAS_HTTPX = False
+
 # Try to save the original types for boto3
 try:
-    from botocore.awsrequest import AWSHTTPConnection, AWSHTTPSConnection
+    import botocore.awsrequest as awsrequest
 except ImportError as e:
     try:
         import botocore.vendored.requests  # noqa: F401
@@ -27,9 +37,10 @@ except ImportError as e:
             "; please upgrade botocore (or downgrade vcrpy)"
         ) from e
 else:
-    _Boto3VerifiedHTTPSConnection = AWSHTTPSConnection
-    _cpoolBoto3HTTPConnection = AWSHTTPConnection
-    _cpoolBoto3HTTPSConnection = AWSHTTPSConnection
+    _HAS_BOTOCORE = True
+    _Boto3VerifiedHTTPSConnection = awsrequest.AWSHTTPSConnection
+    _cpoolBoto3HTTPConnection = awsrequest.AWSHTTPConnection
+    _cpoolBoto3HTTPSConnection = awsrequest.AWSHTTPSConnection
 
 cpool = None
 conn = None
@@ -40,6 +51,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_URLLIB3 = True
     _VerifiedHTTPSConnection = conn.VerifiedHTTPSConnection
     _connHTTPConnection = conn.HTTPConnection
     _connHTTPSConnection = conn.HTTPSConnection
@@ -63,6 +75,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_HTTPLIB2 = True
     _HTTPConnectionWithTimeout = httplib2.HTTPConnectionWithTimeout
     _HTTPSConnectionWithTimeout = httplib2.HTTPSConnectionWithTimeout
     _SCHEME_TO_CONNECTION = httplib2.SCHEME_TO_CONNECTION
@@ -73,6 +86,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_BOTO = True
     _CertValidatingHTTPSConnection = boto.https_connection.CertValidatingHTTPSConnection
 
 # Try to save the original types for Tornado
@@ -81,6 +95,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_TORNADO_SIMPLE = True
     _SimpleAsyncHTTPClient_fetch_impl = tornado.simple_httpclient.SimpleAsyncHTTPClient.fetch_impl
 
 try:
@@ -88,6 +103,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_TORNADO_CURL = True
     _CurlAsyncHTTPClient_fetch_impl = tornado.curl_httpclient.CurlAsyncHTTPClient.fetch_impl
 
 try:
@@ -95,6 +111,7 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_AIOHTTP = True
     _AiohttpClientSessionRequest = aiohttp.client.ClientSession._request
 
 
@@ -103,50 +120,317 @@ try:
 except ImportError:  # pragma: no cover
     pass
 else:
+    _HAS_HTTPX = True
     _HttpxSyncClient_send = httpx.Client.send
     _HttpxAsyncClient_send = httpx.AsyncClient.send
 
 
-class CassettePatcherBuilder:
-    def _build_patchers_from_mock_triples_decorator(function):
-        @functools.wraps(function)
-        def wrapped(self, *args, **kwargs):
-            return self._build_patchers_from_mock_triples(function(self, *args, **kwargs))
+_MISSING = object()
 
-        return wrapped
 
-    def __init__(self, cassette):
-        self._cassette = cassette
-        self._class_to_cassette_subclass = {}
+class _AttrPatch:
+    """Lightweight stand-in for ``mock.patch.object``.
 
-    def build(self):
-        return itertools.chain(
-            self._httplib(),
-            self._requests(),
-            self._boto3(),
-            self._urllib3(),
-            self._httplib2(),
-            self._boto(),
-            self._tornado(),
-            self._aiohttp(),
-            self._httpx(),
-            self._build_patchers_from_mock_triples(self._cassette.custom_patches),
+    Like ``mock``, the original value is read from the target's own
+    ``__dict__`` so that attributes inherited from a base class are
+    deleted again on exit rather than shadowed on the subclass. Targets
+    without a ``__dict__`` (e.g. instances using ``__slots__``) get the
+    looked-up value set back if deleting the patch left them without
+    the attribute.
+    """
+
+    __slots__ = ("obj", "name", "new", "_original", "_fallback")
+
+    def __init__(self, obj, name, new):
+        self.obj = obj
+        self.name = name
+        self.new = new
+        self._original = _MISSING
+        self._fallback = _MISSING
+
+    def __enter__(self):
+        try:
+            self._original = self.obj.__dict__[self.name]
+        except (AttributeError, KeyError):
+            self._original = _MISSING
+            self._fallback = getattr(self.obj, self.name, _MISSING)
+        setattr(self.obj, self.name, self.new)
+        return self.new
+
+    def __exit__(self, *args):
+        if self._original is _MISSING:
+            delattr(self.obj, self.name)
+            if self._fallback is not _MISSING and not hasattr(self.obj, self.name):
+                setattr(self.obj, self.name, self._fallback)
+        else:
+            setattr(self.obj, self.name, self._original)
+        self._original = _MISSING
+        self._fallback = _MISSING
+
+
+def _patched_get_conn(connection_pool_class, connection_class_getter):
+    get_conn = connection_pool_class._get_conn
+    has_connection_cls = hasattr(connection_pool_class, "ConnectionCls")
+
+    def patched_get_conn(pool, timeout=None):
+        connection_class = pool.ConnectionCls if has_connection_cls else connection_class_getter()
+        # We need to make sure that we are actually providing a
+        # patched version of the connection class. This might not
+        # always be the case because the pool keeps previously
+        # used connections (which might actually be of a different
+        # class) around. Rather than creating and throwing away
+        # connections until we get a suitable one, move the topmost
+        # patched connection (or empty slot, which gets a new
+        # connection) to the top of the queue first. This relies on
+        # the internals of queue.LifoQueue, so pools with any other
+        # QueueCls only get the drain loop below.
+        connection_queue = pool.pool
+        if isinstance(connection_queue, queue.LifoQueue):
+            with connection_queue.mutex:
+                connections = connection_queue.queue
+                for index in range(len(connections) - 1, -1, -1):
+                    connection = connections[index]
+                    if connection is None or isinstance(connection, connection_class):
+                        del connections[index]
+                        connections.append(connection)
+                        break
+        connection = get_conn(pool, timeout)
+        # Another thread may have raced us to the connection, or the
+        # queue may not be a LifoQueue, in which case fall back to
+        # draining the pool. This while loop
+        # will terminate because eventually the pool will run out
+        # of connections.
+        while not isinstance(connection, connection_class):
+            connection = get_conn(pool, timeout)
+        return connection
+
+    return patched_get_conn
+
+
+def _patched_new_conn(connection_pool_class, connection_remover):
+    new_conn = connection_pool_class._new_conn
+
+    def patched_new_conn(pool):
+        new_connection = new_conn(pool)
+        connection_remover.add_connection_to_pool_entry(pool, new_connection)
+        return new_connection
+
+    return patched_new_conn
+
+
+def _is_connection_dropped(*args, **kwargs):
+    return False
+
+
+def _urllib3_replacements(cpool, conn, stubs):
+    return (
+        (conn, "VerifiedHTTPSConnection", stubs.VCRRequestsHTTPSConnection),
+        (conn, "HTTPConnection", stubs.VCRRequestsHTTPConnection),
+        (conn, "HTTPSConnection", stubs.VCRRequestsHTTPSConnection),
+        (cpool.HTTPConnectionPool, "ConnectionCls", stubs.VCRRequestsHTTPConnection),
+        (cpool.HTTPSConnectionPool, "ConnectionCls", stubs.VCRRequestsHTTPSConnection),
+    )
+
+
+def _urllib3_replacement_factories(cpool, stubs):
+    get_http_connection_class = functools.partial(getattr, cpool, "HTTPConnection")
+    get_https_connection_class = functools.partial(getattr, cpool, "HTTPSConnection")
+    return (
+        # These handle making sure that sessions only use the
+        # connections of the appropriate type.
+        (
+            cpool.HTTPConnectionPool,
+            "_get_conn",
+            lambda builder: _patched_get_conn(cpool.HTTPConnectionPool, get_http_connection_class),
+        ),
+        (
+            cpool.HTTPSConnectionPool,
+            "_get_conn",
+            lambda builder: _patched_get_conn(cpool.HTTPSConnectionPool, get_https_connection_class),
+        ),
+        (
+            cpool.HTTPConnectionPool,
+            "_new_conn",
+            lambda builder: _patched_new_conn(
+                cpool.HTTPConnectionPool, builder._connection_remover(stubs.VCRRequestsHTTPConnection)
+            ),
+        ),
+        (
+            cpool.HTTPSConnectionPool,
+            "_new_conn",
+            lambda builder: _patched_new_conn(
+                cpool.HTTPSConnectionPool, builder._connection_remover(stubs.VCRRequestsHTTPSConnection)
+            ),
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _discover_integrations():
+    """Return the patch template for the optional HTTP libraries that are
+    installed.
+
+    The template is made of three tuples. The first holds
+    ``(obj, attribute, stub_class)`` triples, which are patched with
+    the cassette's subclass of ``stub_class``. The second holds
+    ``(obj, attribute, replacement)`` triples whose replacement is the
+    same for every cassette, up to the classes it contains. The third
+    holds ``(obj, attribute, replacement_factory)`` triples, where
+    ``replacement_factory`` is called with the
+    ``CassettePatcherBuilder`` to produce a replacement bound to its
+    cassette. Building the template imports the stubs for every
+    supported library, so it is only done once.
+    """
+    stub_replacements = []
+    replacements = []
+    replacement_factories = []
+
+    if _HAS_URLLIB3:
+        from .stubs import requests_stubs, urllib3_stubs
+
+        # Both patch the same attributes, and urllib3_stubs must be entered last.
+        for stubs in (requests_stubs, urllib3_stubs):
+            stub_replacements.extend(_urllib3_replacements(cpool, conn, stubs))
+            replacement_factories.extend(_urllib3_replacement_factories(cpool, stubs))
+        # Needed on Windows only
+        replacements.append((cpool, "is_connection_dropped", _is_connection_dropped))
+
+    if _HAS_BOTOCORE:
+        from .stubs import boto3_stubs
+
+        log.debug("Adding boto3 cpool %s to the patch template", awsrequest)
+        stub_replacements += [
+            (awsrequest.AWSHTTPConnectionPool, "ConnectionCls", boto3_stubs.VCRRequestsHTTPConnection),
+            (awsrequest.AWSHTTPSConnectionPool, "ConnectionCls", boto3_stubs.VCRRequestsHTTPSConnection),
+        ]
+
+    if _HAS_HTTPLIB2:
+        from .stubs.httplib2_stubs import VCRHTTPConnectionWithTimeout, VCRHTTPSConnectionWithTimeout
+
+        stub_replacements += [
+            (httplib2, "HTTPConnectionWithTimeout", VCRHTTPConnectionWithTimeout),
+            (httplib2, "HTTPSConnectionWithTimeout", VCRHTTPSConnectionWithTimeout),
+        ]
+        replacements.append(
+            (
+                httplib2,
+                "SCHEME_TO_CONNECTION",
+                {
+                    "http": VCRHTTPConnectionWithTimeout,
+                    "https": VCRHTTPSConnectionWithTimeout,
+                },
+            )
+        )
+
+    if _HAS_BOTO:
+        from .stubs.boto_stubs import VCRCertValidatingHTTPSConnection
+
+        stub_replacements.append(
+            (boto.https_connection, "CertValidatingHTTPSConnection", VCRCertValidatingHTTPSConnection)
         )
 
-    def _build_patchers_from_mock_triples(self, mock_triples):
-        for args in mock_triples:
-            patcher = self._build_patcher(*args)
-            if patcher:
-                yield patcher
+    if _HAS_TORNADO_SIMPLE or _HAS_TORNADO_CURL:
+        from .stubs.tornado_stubs import vcr_fetch_impl
 
-    def _build_patcher(self, obj, patched_attribute, replacement_class):
-        if not hasattr(obj, patched_attribute):
-            return
+    if _HAS_TORNADO_SIMPLE:
+        replacement_factories.append(
+            (
+                tornado.simple_httpclient.SimpleAsyncHTTPClient,
+                "fetch_impl",
+                lambda builder: vcr_fetch_impl(builder._cassette, _SimpleAsyncHTTPClient_fetch_impl),
+            )
+        )
 
-        return mock.patch.object(
-            obj, patched_attribute, self._recursively_apply_get_cassette_subclass(replacement_class)
+    if _HAS_TORNADO_CURL:
+        replacement_factories.append(
+            (
+                tornado.curl_httpclient.CurlAsyncHTTPClient,
+                "fetch_impl",
+                lambda builder: vcr_fetch_impl(builder._cassette, _CurlAsyncHTTPClient_fetch_impl),
+            )
+        )
+
+    if _HAS_AIOHTTP:
+        from .stubs.aiohttp_stubs import vcr_request
+
+        replacement_factories.append(
+            (
+                aiohttp.client.ClientSession,
+                "_request",
+                lambda builder: vcr_request(builder._cassette, _AiohttpClientSessionRequest),
+            )
         )
 
+    if _HAS_HTTPX:
+        from .stubs.httpx_stubs import async_vcr_send, sync_vcr_send
+
+        replacement_factories += [
+            (
+                httpx.AsyncClient,
+                "send",
+                lambda builder: async_vcr_send(builder._cassette, _HttpxAsyncClient_send),
+            ),
+            (httpx.Client, "send", lambda builder: sync_vcr_send(builder._cassette, _HttpxSyncClient_send)),
+        ]
+
+    # The patched modules and classes do not change, so attributes that
+    # a library version lacks are filtered out once here.
+    return tuple(
+        tuple(triple for triple in triples if hasattr(triple[0], triple[1]))
+        for triples in (stub_replacements, replacements, replacement_factories)
+    )
+
+
+class CassettePatcherBuilder:
+    __slots__ = (
+        "_cassette",
+        "_class_to_cassette_subclass",
+        "_id_to_applied_replacement_dict",
+        "_connection_removers",
+        "_http_sub",
+        "_https_sub",
+    )
+
+    def __init__(self, cassette):
+        self._cassette = cassette
+        self._class_to_cassette_subclass = {}
+        self._id_to_applied_replacement_dict = {}
+        self._connection_removers = []
+        self._http_sub = self._get_cassette_subclass(VCRHTTPConnection)
+        self._https_sub = self._get_cassette_subclass(VCRHTTPSConnection)
+
+    def build(self):
+        # The replacements are all created before any patcher is
+        # entered, so that the urllib3 wrappers close over the
+        # unpatched ``_get_conn`` and ``_new_conn``.
+        self._connection_removers = []
+        stub_replacements, replacements, replacement_factories = _discover_integrations()
+        patchers = [
+            _AttrPatch(httplib, "HTTPConnection", self._http_sub),
+            _AttrPatch(httplib, "HTTPSConnection", self._https_sub),
+        ]
+        patchers += [
+            _AttrPatch(obj, patched_attribute, self._get_cassette_subclass(stub_class))
+            for obj, patched_attribute, stub_class in stub_replacements
+        ]
+        patchers += [
+            _AttrPatch(obj, patched_attribute, self._recursively_apply_get_cassette_subclass(replacement))
+            for obj, patched_attribute, replacement in replacements
+        ]
+        patchers += [
+            _AttrPatch(obj, patched_attribute, self._recursively_apply_get_cassette_subclass(factory(self)))
+            for obj, patched_attribute, factory in replacement_factories
+        ]
+        patchers += [
+            _AttrPatch(obj, patched_attribute, self._recursively_apply_get_cassette_subclass(replacement))
+            for obj, patched_attribute, replacement in self._cassette.custom_patches
+            if hasattr(obj, patched_attribute)
+        ]
+        # The connection removers go last, so that they are the first
+        # to exit and every patcher of the same type is entered together.
+        patchers.extend(self._connection_removers)
+        return patchers
+
     def _recursively_apply_get_cassette_subclass(self, replacement_dict_or_obj):
         """One of the subtleties of this class is that it does not directly
         replace HTTPSConnection with `VCRRequestsHTTPSConnection`, but a
@@ -163,13 +447,23 @@ class CassettePatcherBuilder:
 
         The function is recursive because it looks in to dictionaries
         and replaces class values at any depth with the subclass
-        described in the previous paragraph.
+        described in the previous paragraph. Dictionaries are copied
+        rather than modified, and each one is only walked once per
+        builder.
         """
         if isinstance(replacement_dict_or_obj, dict):
-            for key, replacement_obj in replacement_dict_or_obj.items():
-                replacement_obj = self._recursively_apply_get_cassette_subclass(replacement_obj)
-                replacement_dict_or_obj[key] = replacement_obj
-            return replacement_dict_or_obj
+            dict_id = id(replacement_dict_or_obj)
+            applied = self._id_to_applied_replacement_dict.get(dict_id)
+            if applied is None:
+                # Keep the original around so that its id cannot be reused.
+                applied = self._id_to_applied_replacement_dict[dict_id] = (
+                    replacement_dict_or_obj,
+                    {
+                        key: self._recursively_apply_get_cassette_subclass(replacement_obj)
+                        for key, replacement_obj in replacement_dict_or_obj.items()
+                    },
+                )
+            return applied[1]
         if hasattr(replacement_dict_or_obj, "cassette"):
             replacement_dict_or_obj = self._get_cassette_subclass(replacement_dict_or_obj)
         return replacement_dict_or_obj
@@ -177,230 +471,49 @@ class CassettePatcherBuilder:
     def _get_cassette_subclass(self, klass):
         if klass.cassette is not None:
             return klass
-        if klass not in self._class_to_cassette_subclass:
-            subclass = self._build_cassette_subclass(klass)
-            self._class_to_cassette_subclass[klass] = subclass
-        return self._class_to_cassette_subclass[klass]
+        cache = self._class_to_cassette_subclass
+        subclass = cache.get(klass)
+        if subclass is None:
+            subclass = cache[klass] = self._build_cassette_subclass(klass)
+        return subclass
 
     def _build_cassette_subclass(self, base_class):
-        bases = (base_class,)
-        if not issubclass(base_class, object):  # Check for old style class
-            bases += (object,)
         return type(
-            "{}{}".format(base_class.__name__, self._cassette._path), bases, dict(cassette=self._cassette)
-        )
-
-    @_build_patchers_from_mock_triples_decorator
-    def _httplib(self):
-        yield httplib, "HTTPConnection", VCRHTTPConnection
-        yield httplib, "HTTPSConnection", VCRHTTPSConnection
-
-    def _requests(self):
-        try:
-            from .stubs import requests_stubs
-        except ImportError:  # pragma: no cover
-            return ()
-        return self._urllib3_patchers(cpool, conn, requests_stubs)
-
-    @_build_patchers_from_mock_triples_decorator
-    def _boto3(self):
-        try:
-            # botocore using awsrequest
-            import botocore.awsrequest as cpool
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs import boto3_stubs
-
-            log.debug("Patching boto3 cpool with %s", cpool)
-            yield cpool.AWSHTTPConnectionPool, "ConnectionCls", boto3_stubs.VCRRequestsHTTPConnection
-            yield cpool.AWSHTTPSConnectionPool, "ConnectionCls", boto3_stubs.VCRRequestsHTTPSConnection
-
-    def _patched_get_conn(self, connection_pool_class, connection_class_getter):
-        get_conn = connection_pool_class._get_conn
-
-        @functools.wraps(get_conn)
-        def patched_get_conn(pool, timeout=None):
-            connection = get_conn(pool, timeout)
-            connection_class = (
-                pool.ConnectionCls if hasattr(pool, "ConnectionCls") else connection_class_getter()
-            )
-            # We need to make sure that we are actually providing a
-            # patched version of the connection class. This might not
-            # always be the case because the pool keeps previously
-            # used connections (which might actually be of a different
-            # class) around. This while loop will terminate because
-            # eventually the pool will run out of connections.
-            while not isinstance(connection, connection_class):
-                connection = get_conn(pool, timeout)
-            return connection
-
-        return patched_get_conn
-
-    def _patched_new_conn(self, connection_pool_class, connection_remover):
-        new_conn = connection_pool_class._new_conn
-
-        @functools.wraps(new_conn)
-        def patched_new_conn(pool):
-            new_connection = new_conn(pool)
-            connection_remover.add_connection_to_pool_entry(pool, new_connection)
-            return new_connection
-
-        return patched_new_conn
-
-    def _urllib3(self):
-        try:
-            import urllib3.connection as conn
-            import urllib3.connectionpool as cpool
-        except ImportError:  # pragma: no cover
-            return ()
-        from .stubs import urllib3_stubs
-
-        return self._urllib3_patchers(cpool, conn, urllib3_stubs)
-
-    @_build_patchers_from_mock_triples_decorator
-    def _httplib2(self):
-        try:
-            import httplib2 as cpool
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs.httplib2_stubs import VCRHTTPConnectionWithTimeout, VCRHTTPSConnectionWithTimeout
-
-            yield cpool, "HTTPConnectionWithTimeout", VCRHTTPConnectionWithTimeout
-            yield cpool, "HTTPSConnectionWithTimeout", VCRHTTPSConnectionWithTimeout
-            yield cpool, "SCHEME_TO_CONNECTION", {
-                "http": VCRHTTPConnectionWithTimeout,
-                "https": VCRHTTPSConnectionWithTimeout,
-            }
-
-    @_build_patchers_from_mock_triples_decorator
-    def _boto(self):
-        try:
-            import boto.https_connection as cpool
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs.boto_stubs import VCRCertValidatingHTTPSConnection
-
-            yield cpool, "CertValidatingHTTPSConnection", VCRCertValidatingHTTPSConnection
-
-    @_build_patchers_from_mock_triples_decorator
-    def _tornado(self):
-        try:
-            import tornado.simple_httpclient as simple
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs.tornado_stubs import vcr_fetch_impl
-
-            new_fetch_impl = vcr_fetch_impl(self._cassette, _SimpleAsyncHTTPClient_fetch_impl)
-            yield simple.SimpleAsyncHTTPClient, "fetch_impl", new_fetch_impl
-        try:
-            import tornado.curl_httpclient as curl
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs.tornado_stubs import vcr_fetch_impl
-
-            new_fetch_impl = vcr_fetch_impl(self._cassette, _CurlAsyncHTTPClient_fetch_impl)
-            yield curl.CurlAsyncHTTPClient, "fetch_impl", new_fetch_impl
-
-    @_build_patchers_from_mock_triples_decorator
-    def _aiohttp(self):
-        try:
-            import aiohttp.client as client
-        except ImportError:  # pragma: no cover
-            pass
-        else:
-            from .stubs.aiohttp_stubs import vcr_request
-
-            new_request = vcr_request(self._cassette, _AiohttpClientSessionRequest)
-            yield client.ClientSession, "_request", new_request
-
-    @_build_patchers_from_mock_triples_decorator
-    def _httpx(self):
-        try:
-            import httpx
-        except ImportError:  # pragma: no cover
-            return
-        else:
-            from .stubs.httpx_stubs import async_vcr_send, sync_vcr_send
-
-            new_async_client_send = async_vcr_send(self._cassette, _HttpxAsyncClient_send)
-            yield httpx.AsyncClient, "send", new_async_client_send
-
-            new_sync_client_send = sync_vcr_send(self._cassette, _HttpxSyncClient_send)
-            yield httpx.Client, "send", new_sync_client_send
-
-    def _urllib3_patchers(self, cpool, conn, stubs):
-        http_connection_remover = ConnectionRemover(
-            self._get_cassette_subclass(stubs.VCRRequestsHTTPConnection)
-        )
-        https_connection_remover = ConnectionRemover(
-            self._get_cassette_subclass(stubs.VCRRequestsHTTPSConnection)
-        )
-        mock_triples = (
-            (conn, "VerifiedHTTPSConnection", stubs.VCRRequestsHTTPSConnection),
-            (conn, "HTTPConnection", stubs.VCRRequestsHTTPConnection),
-            (conn, "HTTPSConnection", stubs.VCRRequestsHTTPSConnection),
-            (cpool, "is_connection_dropped", mock.Mock(return_value=False)),  # Needed on Windows only
-            (cpool.HTTPConnectionPool, "ConnectionCls", stubs.VCRRequestsHTTPConnection),
-            (cpool.HTTPSConnectionPool, "ConnectionCls", stubs.VCRRequestsHTTPSConnection),
-        )
-        # These handle making sure that sessions only use the
-        # connections of the appropriate type.
-        mock_triples += (
-            (
-                cpool.HTTPConnectionPool,
-                "_get_conn",
-                self._patched_get_conn(cpool.HTTPConnectionPool, lambda: cpool.HTTPConnection),
-            ),
-            (
-                cpool.HTTPSConnectionPool,
-                "_get_conn",
-                self._patched_get_conn(cpool.HTTPSConnectionPool, lambda: cpool.HTTPSConnection),
-            ),
-            (
-                cpool.HTTPConnectionPool,
-                "_new_conn",
-                self._patched_new_conn(cpool.HTTPConnectionPool, http_connection_remover),
-            ),
-            (
-                cpool.HTTPSConnectionPool,
-                "_new_conn",
-                self._patched_new_conn(cpool.HTTPSConnectionPool, https_connection_remover),
-            ),
+            f"{base_class.__name__}{self._cassette._path}", (base_class,), dict(cassette=self._cassette)
         )
 
-        return itertools.chain(
-            self._build_patchers_from_mock_triples(mock_triples),
-            (http_connection_remover, https_connection_remover),
-        )
+    def _connection_remover(self, connection_class):
+        connection_remover = ConnectionRemover(self._get_cassette_subclass(connection_class))
+        self._connection_removers.append(connection_remover)
+        return connection_remover
 
 
 class ConnectionRemover:
+    __slots__ = ("_connection_class", "_connection_pool_to_connections")
+
     def __init__(self, connection_class):
         self._connection_class = connection_class
-        self._connection_pool_to_connections = {}
+        self._connection_pool_to_connections = collections.defaultdict(set)
 
     def add_connection_to_pool_entry(self, pool, connection):
         if isinstance(connection, self._connection_class):
-            self._connection_pool_to_connections.setdefault(pool, set()).add(connection)
+            self._connection_pool_to_connections[pool].add(connection)
 
     def remove_connection_to_pool_entry(self, pool, connection):
-        if isinstance(connection, self._connection_class):
-            self._connection_pool_to_connections[self._connection_class].remove(connection)
+        connections = self._connection_pool_to_connections.get(pool)
+        if connections is not None:
+            connections.discard(connection)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
+        connection_class = self._connection_class
         for pool, connections in self._connection_pool_to_connections.items():
             readd_connections = []
             while pool.pool and not pool.pool.empty() and connections:
                 connection = pool.pool.get()
-                if isinstance(connection, self._connection_class):
+                if isinstance(connection, connection_class):
                     connections.remove(connection)
                 else:
                     readd_connections.append(connection)
@@ -408,69 +521,76 @@ class ConnectionRemover:
                 pool._put_conn(connection)
 
 
-def reset_patchers():
-    yield mock.patch.object(httplib, "HTTPConnection", _HTTPConnection)
-    yield mock.patch.object(httplib, "HTTPSConnection", _HTTPSConnection)
+def _reset_patch_specs():
+    specs = [
+        (httplib, "HTTPConnection", _HTTPConnection),
+        (httplib, "HTTPSConnection", _HTTPSConnection),
+    ]
 
-    try:
-        import urllib3.connection as conn
-        import urllib3.connectionpool as cpool
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        yield mock.patch.object(conn, "VerifiedHTTPSConnection", _VerifiedHTTPSConnection)
-        yield mock.patch.object(conn, "HTTPConnection", _connHTTPConnection)
-        yield mock.patch.object(conn, "HTTPSConnection", _connHTTPSConnection)
+    if _HAS_URLLIB3:
+        specs += [
+            (conn, "VerifiedHTTPSConnection", _VerifiedHTTPSConnection),
+            (conn, "HTTPConnection", _connHTTPConnection),
+            (conn, "HTTPSConnection", _connHTTPSConnection),
+        ]
         if hasattr(cpool.HTTPConnectionPool, "ConnectionCls"):
-            yield mock.patch.object(cpool.HTTPConnectionPool, "ConnectionCls", _connHTTPConnection)
-            yield mock.patch.object(cpool.HTTPSConnectionPool, "ConnectionCls", _connHTTPSConnection)
+            specs += [
+                (cpool.HTTPConnectionPool, "ConnectionCls", _connHTTPConnection),
+                (cpool.HTTPSConnectionPool, "ConnectionCls", _connHTTPSConnection),
+            ]
 
-    try:
+    if _HAS_BOTOCORE:
         # unpatch botocore with awsrequest
-        import botocore.awsrequest as cpool
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        if hasattr(cpool.AWSHTTPConnectionPool, "ConnectionCls"):
-            yield mock.patch.object(cpool.AWSHTTPConnectionPool, "ConnectionCls", _cpoolBoto3HTTPConnection)
-            yield mock.patch.object(cpool.AWSHTTPSConnectionPool, "ConnectionCls", _cpoolBoto3HTTPSConnection)
+        if hasattr(awsrequest.AWSHTTPConnectionPool, "ConnectionCls"):
+            specs += [
+                (awsrequest.AWSHTTPConnectionPool, "ConnectionCls", _cpoolBoto3HTTPConnection),
+                (awsrequest.AWSHTTPSConnectionPool, "ConnectionCls", _cpoolBoto3HTTPSConnection),
+            ]
+
+        if hasattr(awsrequest, "AWSHTTPSConnection"):
+            specs.append((awsrequest, "AWSHTTPSConnection", _cpoolBoto3HTTPSConnection))
+
+    if _HAS_HTTPLIB2:
+        specs += [
+            (httplib2, "HTTPConnectionWithTimeout", _HTTPConnectionWithTimeout),
+            (httplib2, "HTTPSConnectionWithTimeout", _HTTPSConnectionWithTimeout),
+            (httplib2, "SCHEME_TO_CONNECTION", _SCHEME_TO_CONNECTION),
+        ]
+
+    if _HAS_BOTO:
+        specs.append((boto.https_connection, "CertValidatingHTTPSConnection", _CertValidatingHTTPSConnection))
+
+    if _HAS_TORNADO_SIMPLE:
+        specs.append(
+            (tornado.simple_httpclient.SimpleAsyncHTTPClient, "fetch_impl", _SimpleAsyncHTTPClient_fetch_impl)
+        )
+    if _HAS_TORNADO_CURL:
+        specs.append(
+            (tornado.curl_httpclient.CurlAsyncHTTPClient, "fetch_impl", _CurlAsyncHTTPClient_fetch_impl)
+        )
 
-        if hasattr(cpool, "AWSHTTPSConnection"):
-            yield mock.patch.object(cpool, "AWSHTTPSConnection", _cpoolBoto3HTTPSConnection)
+    return tuple(specs)
 
-    try:
-        import httplib2 as cpool
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        yield mock.patch.object(cpool, "HTTPConnectionWithTimeout", _HTTPConnectionWithTimeout)
-        yield mock.patch.object(cpool, "HTTPSConnectionWithTimeout", _HTTPSConnectionWithTimeout)
-        yield mock.patch.object(cpool, "SCHEME_TO_CONNECTION", _SCHEME_TO_CONNECTION)
 
-    try:
-        import boto.https_connection as cpool
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        yield mock.patch.object(cpool, "CertValidatingHTTPSConnection", _CertValidatingHTTPSConnection)
+# The (obj, attribute, original) triples that force_reset() puts back.
+_RESET_PATCH_SPECS = _reset_patch_specs()
 
-    try:
-        import tornado.simple_httpclient as simple
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        yield mock.patch.object(simple.SimpleAsyncHTTPClient, "fetch_impl", _SimpleAsyncHTTPClient_fetch_impl)
-    try:
-        import tornado.curl_httpclient as curl
-    except ImportError:  # pragma: no cover
-        pass
-    else:
-        yield mock.patch.object(curl.CurlAsyncHTTPClient, "fetch_impl", _CurlAsyncHTTPClient_fetch_impl)
+
+def reset_patchers():
+    for obj, patched_attribute, original in _RESET_PATCH_SPECS:
+        yield _AttrPatch(obj, patched_attribute, original)
 
 
 @contextlib.contextmanager
 def force_reset():
     with contextlib.ExitStack() as exit_stack:
-        for patcher in reset_patchers():
-            exit_stack.enter_context(patcher)
+        # Same as entering each of reset_patchers(), without creating
+        # an _AttrPatch for every attribute.
+        for obj, patched_attribute, original in _RESET_PATCH_SPECS:
+            current = obj.__dict__.get(patched_attribute, _MISSING)
+            setattr(obj, patched_attribute, original)
+            if current is _MISSING:
+                exit_stack.callback(delattr, obj, patched_attribute)
+            else:
+                exit_stack.callback(setattr, obj, patched_attribute, current)
         yield